@@ -0,0 +1,187 @@
+"""
+Shared ans.md parser and output cache helpers for the (n,k) plotting scripts
+"""
+
+import hashlib
+import mmap
+import os
+import re
+from pathlib import Path
+import numpy as np
+
+# Header line opening each d section of ans.md
+_SECTION_RE = re.compile(rb'=== All valid \(n,k\) combinations for d = (\d+) ===')
+
+def parse_ans_file(filename):
+    """Parse the ans.md file to extract (n,k) combinations for each d value
+
+    Returns a dict mapping d to an (N, 2) array of unique (n, k) rows,
+    sorted by n then k. Arrays are uint8 when every value fits, which
+    covers the n <= 50 table find_nk produces, int32 otherwise, and
+    int64 only for values beyond int32.
+    Parsed arrays are saved next to the file (ans.md -> ans.npz) with its
+    mtime and size, so the next script run on an unchanged file loads
+    them instead of parsing again.
+    """
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        print(f"Error: Could not find file {filename}")
+        return {}
+    
+    cache = Path(filename).with_suffix('.npz')
+    key = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    loaded = _load_cache(cache, key)
+    if loaded is not None:
+        combinations, row_counts = loaded
+    else:
+        try:
+            combinations, row_counts = _parse_impl(filename, stat.st_size)
+        except Exception as e:
+            print(f"Error parsing file: {e}")
+            return {}
+        _store_cache(cache, key, combinations, row_counts)
+    
+    for d, arr in combinations.items():
+        print(f"d={d}: {row_counts[d]} rows -> {len(arr)} unique")
+    
+    return combinations
+
+def _load_cache(cache, key):
+    """Load (combinations, row_counts) from cache if it was saved for key, else None"""
+    try:
+        with np.load(cache) as z:
+            if not np.array_equal(z['key'], key):
+                return None
+            combinations = {int(name[1:]): z[name] for name in z.files if name.startswith('d')}
+            row_counts = {d: int(z[f'rows{d}']) for d in combinations}
+    except Exception:
+        # Missing or unreadable cache; parse the file instead
+        return None
+    return combinations, row_counts
+
+def _store_cache(cache, key, combinations, row_counts):
+    """Save parsed combinations to cache, tagged with the source file's key"""
+    arrays = {'key': key}
+    for d, arr in combinations.items():
+        arrays[f'd{d}'] = arr
+        arrays[f'rows{d}'] = np.int64(row_counts[d])
+    tmp = cache.with_name(cache.name + '.tmp')
+    try:
+        # Write aside and rename so a concurrent reader never sees half a file
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, cache)
+    except OSError as e:
+        print(f"Warning: could not write parse cache {cache}: {e}")
+
+def _parse_impl(path, size):
+    combinations = {}
+    row_counts = {}
+    
+    # mmap refuses empty files, which have no sections anyway
+    if size == 0:
+        return combinations, row_counts
+    
+    # Scan the page-cached bytes directly instead of decoding the whole file
+    parts = {}
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Locate the d=3 and d=4 section headers once
+        matches = list(_SECTION_RE.finditer(mm))
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(mm)
+            start, end = _table_bounds(mm, match.end(), end)
+            if start >= end:
+                raw = np.empty((0, 2), dtype=np.int32)
+            else:
+                # Stream the numeric rows into the tokenizer without copying the section
+                try:
+                    raw = np.loadtxt(_iter_lines(mm, start, end), dtype=np.int32,
+                                     usecols=(0, 1), ndmin=2, comments=None)
+                except ValueError as e:
+                    # Stray text in the table; fall back to the tolerant row scanner
+                    print(f"Warning: malformed rows in d = {match.group(1).decode()} section ({e}); "
+                          f"using the slow row scanner")
+                    # A row takes at least "n k" plus a newline, i.e. four bytes
+                    raw = _scan_rows(_iter_lines(mm, start, end), (end - start + 1) // 4)
+            parts.setdefault(int(match.group(1)), []).append(raw)
+    
+    for d, arrays in parts.items():
+        raw = np.concatenate(arrays)
+        # Repeated (n,k) rows would only be overplotted
+        arr = np.unique(raw, axis=0)
+        row_counts[d] = len(raw)
+        # Narrow to one byte per value for faster downstream scans
+        if not len(arr) or (arr.min() >= 0 and arr.max() <= np.iinfo(np.uint8).max):
+            arr = arr.astype(np.uint8)
+        elif arr.min() >= np.iinfo(np.int32).min and arr.max() <= np.iinfo(np.int32).max:
+            arr = arr.astype(np.int32, copy=False)
+        combinations[d] = arr
+    
+    return combinations, row_counts
+
+def _table_bounds(mm, start, end):
+    """Narrow a section to the rows between its dashed rule and Total: line"""
+    rule = mm.find(b'\n---', start, end)
+    if rule != -1:
+        rule_end = mm.find(b'\n', rule + 1, end)
+        start = rule_end + 1 if rule_end != -1 else end
+    total = mm.find(b'Total:', start, end)
+    if total != -1:
+        end = total
+    # Stop before the rule closing the table, if there is one
+    closing = mm.rfind(b'\n---', start - 1, end)
+    if closing != -1:
+        end = closing + 1
+    return start, end
+
+def _iter_lines(mm, start, end):
+    """Yield the lines of mm[start:end] one at a time"""
+    mm.seek(start)
+    pos = start
+    while pos < end:
+        line = mm.readline()
+        # Never hand out bytes past end, even when end falls mid-line
+        yield line[:end - pos] if pos + len(line) > end else line
+        pos += len(line)
+
+def _scan_rows(lines, max_rows):
+    """Extract (n, k) from every line that starts with two integers, skipping the rest"""
+    # Preallocated to an upper bound and truncated to the rows actually found;
+    # int64 keeps oversized rows, which the caller narrows afterwards
+    out = np.empty((max_rows, 2), dtype=np.int64)
+    count = 0
+    for line in lines:
+        line = line.lstrip()
+        # One-character reject for headers, rules and totals
+        if not line[:1].isdigit():
+            continue
+        parts = line.split(None, 2)
+        if len(parts) < 2:
+            continue
+        try:
+            out[count] = int(parts[0]), int(parts[1])
+        except (ValueError, OverflowError):
+            continue
+        count += 1
+    return out[:count].copy()
+
+def combinations_digest(combinations, *extra):
+    """Hash parsed combinations, plus any extra bytes, into a hex digest"""
+    h = hashlib.blake2b(digest_size=16)
+    for d in sorted(combinations):
+        arr = combinations[d]
+        h.update(f'{d}:{arr.dtype.str}:{arr.shape}'.encode())
+        h.update(arr.tobytes())
+    for data in extra:
+        h.update(data)
+    return h.hexdigest()
+
+def is_up_to_date(out_png, digest):
+    """Check whether out_png exists and was rendered from inputs with this digest"""
+    sidecar = Path(out_png + '.hash')
+    return Path(out_png).exists() and sidecar.exists() and sidecar.read_text() == digest
+
+def record_digest(out_png, digest):
+    """Remember the input digest out_png was rendered from"""
+    Path(out_png + '.hash').write_text(digest)
@@ -0,0 +1,32 @@
+"""
+Shared matplotlib backend helpers and plot constants for the (n,k) plotting scripts
+"""
+
+import os
+import sys
+import matplotlib
+from matplotlib.backends import BackendFilter, backend_registry
+import numpy as np
+
+# Plots are regenerated often; trade PNG size for faster zlib encoding
+PNG_KWARGS = {'optimize': False, 'compress_level': 1}
+
+# Singleton bound lines, clipped to the view by the axis limits
+BOUND_N = np.linspace(1, 50, 100)
+BOUND_K3 = BOUND_N - 2
+BOUND_K4 = BOUND_N - 3
+
+def use_headless_backend():
+    """Switch to Agg on Linux machines with no X11 or Wayland display
+
+    Must run before pyplot is imported. macOS and Windows desktops never
+    set DISPLAY, so they keep matplotlib's own backend choice.
+    """
+    if (sys.platform.startswith('linux')
+            and not os.environ.get('DISPLAY')
+            and not os.environ.get('WAYLAND_DISPLAY')):
+        matplotlib.use('Agg')
+
+def backend_is_interactive():
+    """Whether the backend matplotlib actually selected can open windows"""
+    return matplotlib.get_backend().lower() in backend_registry.list_builtin(BackendFilter.INTERACTIVE)
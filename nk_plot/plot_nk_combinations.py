@@ -3,143 +3,158 @@
 Plot (n,k) combinations for d=3 and d=4 from ans.md file
 """
 
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from _plotting import BOUND_K3, BOUND_K4, BOUND_N, PNG_KWARGS, backend_is_interactive, use_headless_backend
+
+# Render off-screen when there is no display to open windows on
+use_headless_backend()
+
 import matplotlib.pyplot as plt
-import re
 import numpy as np
+from matplotlib.colors import ListedColormap, to_rgba
+from pathlib import Path
+from _parse import combinations_digest, is_up_to_date, parse_ans_file, record_digest
 
-def parse_ans_file(filename):
-    """Parse the ans.md file to extract (n,k) combinations for each d value"""
-    combinations = {}
-    
-    try:
-        with open(filename, 'r') as f:
-            content = f.read()
-        
-        # Split by d=3 and d=4 sections
-        sections = re.split(r'=== All valid \(n,k\) combinations for d = (\d+) ===', content)
-        
-        current_d = None
-        for i, section in enumerate(sections):
-            if section.strip() in ['3', '4']:
-                current_d = int(section.strip())
-                combinations[current_d] = []
-            elif current_d is not None and i > 0:
-                # Parse the table data
-                lines = section.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('n\t') and not line.startswith('---') and not line.startswith('Total:'):
-                        # Split by tab or multiple spaces
-                        parts = re.split(r'\s+', line)
-                        if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
-                            n, k = int(parts[0]), int(parts[1])
-                            combinations[current_d].append((n, k))
-        
-        return combinations
-    
-    except FileNotFoundError:
-        print(f"Error: Could not find file {filename}")
-        return {}
-    except Exception as e:
-        print(f"Error parsing file: {e}")
-        return {}
+# Colors for different d values, resolved to RGBA once at import
+_FULL_RGBA = {3: to_rgba('blue', alpha=0.6), 4: to_rgba('red', alpha=0.6)}
+_ZOOMED_RGBA = {3: to_rgba('blue', alpha=0.7), 4: to_rgba('red', alpha=0.7)}
+# Single-color maps so dense grids match the marker colors in the legend
+_DENSE_CMAPS = {d: ListedColormap([rgba]) for d, rgba in _FULL_RGBA.items()}
+
+# Above this many points per d the full plot draws a count grid instead of markers
+_DENSE_POINTS = 2000
 
 def plot_combinations(combinations):
     """Create scatter plots for the (n,k) combinations"""
     
     # Set up the plot
-    plt.figure(figsize=(14, 10))
+    fig = plt.figure(figsize=(14, 10))
+    ax = fig.add_subplot()
     
-    # Colors for different d values
-    colors = {3: 'blue', 4: 'red'}
     markers = {3: 'o', 4: 's'}
     
+    # Overall n and k maxima, shared by the count grids, boundary lines and axis limits
+    n_max, k_max = np.concatenate(list(combinations.values())).max(axis=0).tolist()
+    
     # Plot each d value
     for d in [3, 4]:
-        if d in combinations and combinations[d]:
-            n_vals = [pair[0] for pair in combinations[d]]
-            k_vals = [pair[1] for pair in combinations[d]]
+        if d in combinations and len(combinations[d]) > _DENSE_POINTS:
+            arr = combinations[d]
+            grid = np.zeros((n_max + 1, k_max + 1), np.int32)
+            np.add.at(grid, (arr[:, 0], arr[:, 1]), 1)
             
-            plt.scatter(n_vals, k_vals, 
-                       c=colors[d], 
-                       marker=markers[d], 
-                       alpha=0.6, 
-                       s=30,
-                       label=f'd = {d} ({len(combinations[d])} points)')
+            # One image instead of a marker per point; empty cells stay transparent
+            ax.imshow(np.ma.masked_equal(grid.T, 0), 
+                      origin='lower', 
+                      cmap=_DENSE_CMAPS[d], 
+                      aspect='auto', 
+                      interpolation='nearest',
+                      extent=(-0.5, n_max + 0.5, -0.5, k_max + 0.5))
+            ax.plot([], [], linestyle='', color=_FULL_RGBA[d], marker=markers[d],
+                    label=f'd = {d} ({len(arr)} points)')
+        elif d in combinations and len(combinations[d]):
+            # A marker-only line draws single-color point clouds faster
+            # than a scatter collection
+            n_vals = combinations[d][:, 0].astype(np.float32)
+            k_vals = combinations[d][:, 1].astype(np.float32)
+            
+            ax.plot(n_vals, k_vals, 
+                    linestyle='', 
+                    color=_FULL_RGBA[d], 
+                    marker=markers[d], 
+                    markersize=np.sqrt(30),
+                    rasterized=True,
+                    zorder=1,
+                    label=f'd = {d} ({len(combinations[d])} points)')
     
     # Customize the plot
-    plt.xlabel('n (codeword length)', fontsize=12)
-    plt.ylabel('k (message length)', fontsize=12)
-    plt.title('Valid (n,k) Combinations for Different Minimum Distances d\nUsing Singleton Bound: d ≤ n - k + 1', fontsize=14)
-    plt.legend(fontsize=11)
-    plt.grid(True, alpha=0.3)
+    ax.set_xlabel('n (codeword length)', fontsize=12)
+    ax.set_ylabel('k (message length)', fontsize=12)
+    ax.set_title('Valid (n,k) Combinations for Different Minimum Distances d\nUsing Singleton Bound: d ≤ n - k + 1', fontsize=14)
+    ax.legend(fontsize=11)
+    ax.grid(True, alpha=0.3)
     
     # Add the diagonal lines showing the Singleton bound
-    n_max = max([max([pair[0] for pair in combinations[d]]) for d in combinations.keys() if combinations[d]])
-    n_range = np.linspace(1, min(50, n_max), 100)
-    
     # For d=3: k ≤ n - 2, so k_max = n - 2
-    plt.plot(n_range, n_range - 2, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
+    ax.plot(BOUND_N, BOUND_K3, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
     
     # For d=4: k ≤ n - 3, so k_max = n - 3  
-    plt.plot(n_range, n_range - 3, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
+    ax.plot(BOUND_N, BOUND_K4, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
     
-    plt.legend(fontsize=10)
+    ax.legend(fontsize=10)
     
     # Set reasonable axis limits
-    if combinations:
-        all_n = []
-        all_k = []
-        for d in combinations:
-            if combinations[d]:
-                all_n.extend([pair[0] for pair in combinations[d]])
-                all_k.extend([pair[1] for pair in combinations[d]])
-        
-        if all_n and all_k:
-            plt.xlim(0, min(51, max(all_n) + 2))
-            plt.ylim(0, max(all_k) + 2)
-    
-    plt.tight_layout()
-    return plt
+    ax.set_xlim(0, min(51, n_max + 2))
+    ax.set_ylim(0, k_max + 2)
+    
+    fig.tight_layout()
+    return fig
 
 def create_zoomed_plot(combinations):
     """Create a zoomed-in plot for smaller n,k values"""
-    plt.figure(figsize=(12, 8))
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_subplot()
     
-    colors = {3: 'blue', 4: 'red'}
     markers = {3: 'o', 4: 's'}
     
     # Plot only points where n <= 25 and k <= 20
     for d in [3, 4]:
-        if d in combinations and combinations[d]:
-            filtered_pairs = [(n, k) for n, k in combinations[d] if n <= 25 and k <= 20]
+        if d in combinations and len(combinations[d]):
+            arr = combinations[d]
+            mask = (arr[:, 0] <= 25) & (arr[:, 1] <= 20)
+            filtered_pairs = arr[mask]
             
-            if filtered_pairs:
-                n_vals = [pair[0] for pair in filtered_pairs]
-                k_vals = [pair[1] for pair in filtered_pairs]
+            if len(filtered_pairs):
+                n_vals = filtered_pairs[:, 0].astype(np.float32)
+                k_vals = filtered_pairs[:, 1].astype(np.float32)
                 
-                plt.scatter(n_vals, k_vals, 
-                           c=colors[d], 
-                           marker=markers[d], 
-                           alpha=0.7, 
-                           s=50,
-                           label=f'd = {d} ({len(filtered_pairs)} points shown)')
+                ax.scatter(n_vals, k_vals, 
+                          color=_ZOOMED_RGBA[d], 
+                          marker=markers[d], 
+                          s=50,
+                          rasterized=True,
+                          zorder=1,
+                          label=f'd = {d} ({len(filtered_pairs)} points shown)')
     
     # Add boundary lines
-    n_range = np.linspace(1, 25, 100)
-    plt.plot(n_range, n_range - 2, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
-    plt.plot(n_range, n_range - 3, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
-    
-    plt.xlabel('n (codeword length)', fontsize=12)
-    plt.ylabel('k (message length)', fontsize=12)
-    plt.title('Valid (n,k) Combinations - Zoomed View (n ≤ 25, k ≤ 20)', fontsize=14)
-    plt.legend(fontsize=11)
-    plt.grid(True, alpha=0.3)
-    plt.xlim(0, 26)
-    plt.ylim(0, 21)
-    
-    plt.tight_layout()
-    return plt
+    ax.plot(BOUND_N, BOUND_K3, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
+    ax.plot(BOUND_N, BOUND_K4, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
+    
+    ax.set_xlabel('n (codeword length)', fontsize=12)
+    ax.set_ylabel('k (message length)', fontsize=12)
+    ax.set_title('Valid (n,k) Combinations - Zoomed View (n ≤ 25, k ≤ 20)', fontsize=14)
+    ax.legend(fontsize=11)
+    ax.grid(True, alpha=0.3)
+    ax.set_xlim(0, 26)
+    ax.set_ylim(0, 21)
+    
+    fig.tight_layout()
+    return fig
+
+# Plot kind -> (drawing function, output file)
+_PLOTS = {
+    'full': (plot_combinations, 'nk_combinations_full.png'),
+    'zoomed': (create_zoomed_plot, 'nk_combinations_zoomed.png'),
+}
+
+def _init_worker():
+    """Force the non-interactive backend in plotting worker processes"""
+    matplotlib.use('Agg')
+
+def _save(fig, filename, digest):
+    """Write fig to filename and remember the input digest it was drawn from"""
+    fig.savefig(filename, dpi=300, bbox_inches='tight', pil_kwargs=PNG_KWARGS)
+    record_digest(filename, digest)
+
+def _render(job):
+    """Draw and save one plot in a worker process, returning its file name"""
+    combinations, kind, digest = job
+    draw, filename = _PLOTS[kind]
+    fig = draw(combinations)
+    _save(fig, filename, digest)
+    plt.close(fig)
+    return filename
 
 def main():
     # Parse the data from ans.md
@@ -154,24 +169,36 @@ def main():
     for d in sorted(combinations.keys()):
         print(f"Found {len(combinations[d])} combinations for d = {d}")
     
-    # Create full plot
-    print("Creating full plot...")
-    plt1 = plot_combinations(combinations)
-    plt1.savefig('nk_combinations_full.png', dpi=300, bbox_inches='tight')
-    print("Saved: nk_combinations_full.png")
-    
-    # Create zoomed plot
-    print("Creating zoomed plot...")
-    plt2 = create_zoomed_plot(combinations)
-    plt2.savefig('nk_combinations_zoomed.png', dpi=300, bbox_inches='tight')
-    print("Saved: nk_combinations_zoomed.png")
-    
-    # Show plots
-    plt.show()
-    
-    print("\nPlots created successfully!")
-    print("- nk_combinations_full.png: Shows all combinations")
-    print("- nk_combinations_zoomed.png: Zoomed view for n ≤ 25, k ≤ 20")
+    # Skip plots already rendered from the same data and plotting code
+    digest = combinations_digest(combinations, Path(__file__).read_bytes(),
+                                 Path(__file__).with_name('_plotting.py').read_bytes())
+    jobs = []
+    for kind, (_, filename) in _PLOTS.items():
+        if is_up_to_date(filename, digest):
+            print(f"Up to date: {filename}")
+        else:
+            jobs.append((combinations, kind, digest))
+    
+    if backend_is_interactive():
+        # Draw every plot here so it can be shown; save only the stale ones
+        stale = {kind for _, kind, _ in jobs}
+        for kind, (draw, filename) in _PLOTS.items():
+            fig = draw(combinations)
+            if kind in stale:
+                _save(fig, filename, digest)
+                print(f"Saved: {filename}")
+        plt.show()
+    elif jobs:
+        # Headless: render the remaining plots in parallel worker processes
+        print("Creating plots...")
+        with ProcessPoolExecutor(max_workers=len(jobs), initializer=_init_worker) as ex:
+            for filename in ex.map(_render, jobs):
+                print(f"Saved: {filename}")
+    
+    if jobs:
+        print("\nPlots created successfully!")
+        print("- nk_combinations_full.png: Shows all combinations")
+        print("- nk_combinations_zoomed.png: Zoomed view for n ≤ 25, k ≤ 20")
 
 if __name__ == "__main__":
     main()
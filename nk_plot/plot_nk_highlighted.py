@@ -3,125 +3,106 @@
 Plot (n,k) combinations with highlighting of current parameter ranges
 """
 
+from _plotting import BOUND_K3, BOUND_K4, BOUND_N, PNG_KWARGS, backend_is_interactive, use_headless_backend
+
+# Render off-screen when there is no display to open windows on
+use_headless_backend()
+
 import matplotlib.pyplot as plt
-import re
 import numpy as np
+from matplotlib.colors import to_rgba
+from matplotlib.patches import Rectangle
+from pathlib import Path
+from _parse import combinations_digest, is_up_to_date, parse_ans_file, record_digest
 
-def parse_ans_file(filename):
-    """Parse the ans.md file to extract (n,k) combinations for each d value"""
-    combinations = {}
-    
-    try:
-        with open(filename, 'r') as f:
-            content = f.read()
-        
-        # Split by d=3 and d=4 sections
-        sections = re.split(r'=== All valid \(n,k\) combinations for d = (\d+) ===', content)
-        
-        current_d = None
-        for i, section in enumerate(sections):
-            if section.strip() in ['3', '4']:
-                current_d = int(section.strip())
-                combinations[current_d] = []
-            elif current_d is not None and i > 0:
-                # Parse the table data
-                lines = section.split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('n\t') and not line.startswith('---') and not line.startswith('Total:'):
-                        # Split by tab or multiple spaces
-                        parts = re.split(r'\s+', line)
-                        if len(parts) >= 2 and parts[0].isdigit() and parts[1].isdigit():
-                            n, k = int(parts[0]), int(parts[1])
-                            combinations[current_d].append((n, k))
-        
-        return combinations
-    
-    except FileNotFoundError:
-        print(f"Error: Could not find file {filename}")
-        return {}
-    except Exception as e:
-        print(f"Error parsing file: {e}")
-        return {}
+# Colors for different d values, resolved to RGBA once at import
+_ALL_RGBA = {3: to_rgba('lightblue', alpha=0.4), 4: to_rgba('lightcoral', alpha=0.4)}
+_HIGHLIGHT_RGBA = {3: to_rgba('darkblue', alpha=0.9), 4: to_rgba('darkred', alpha=0.9)}
+_HIGHLIGHT_EDGE_RGBA = to_rgba('black', alpha=0.9)
+
+# Current parameter ranges from your code
+_CURRENT_N_RANGE = [16, 17]
+_CURRENT_K_RANGE = [6, 7]
+_CURRENT_D_RANGE = [3, 4]
+_LO_N, _HI_N = min(_CURRENT_N_RANGE), max(_CURRENT_N_RANGE)
+_LO_K, _HI_K = min(_CURRENT_K_RANGE), max(_CURRENT_K_RANGE)
+
+def _in_current_range(arr):
+    """Boolean mask of the (n, k) rows inside the current parameter ranges"""
+    return (arr[:, 0] >= _LO_N) & (arr[:, 0] <= _HI_N) & (arr[:, 1] >= _LO_K) & (arr[:, 1] <= _HI_K)
+
+# Dashed outline around the current parameter space
+_RECT_XY = (_LO_N - 0.4, _LO_K - 0.4)
+_RECT_WIDTH = _HI_N - _LO_N + 0.8
+_RECT_HEIGHT = _HI_K - _LO_K + 0.8
 
 def plot_with_highlights(combinations):
-    """Create plot highlighting current parameter ranges"""
+    """Create a plot highlighting current parameter ranges"""
     
-    plt.figure(figsize=(14, 10))
+    fig = plt.figure(figsize=(14, 10))
+    ax = fig.add_subplot()
     
-    # Colors for different d values
-    colors = {3: 'lightblue', 4: 'lightcoral'}
-    highlight_colors = {3: 'darkblue', 4: 'darkred'}
     markers = {3: 'o', 4: 's'}
     
-    # Current parameter ranges from your code
-    current_n_range = [16, 17]
-    current_k_range = [6, 7]
-    current_d_range = [3, 4]
-    
     # Plot all combinations
     for d in [3, 4]:
-        if d in combinations and combinations[d]:
-            n_vals = [pair[0] for pair in combinations[d]]
-            k_vals = [pair[1] for pair in combinations[d]]
+        if d in combinations and len(combinations[d]):
+            n_vals = combinations[d][:, 0].astype(np.float32)
+            k_vals = combinations[d][:, 1].astype(np.float32)
             
-            plt.scatter(n_vals, k_vals, 
-                       c=colors[d], 
-                       marker=markers[d], 
-                       alpha=0.4, 
-                       s=20,
-                       label=f'd = {d} (all valid)')
+            ax.scatter(n_vals, k_vals, 
+                      color=_ALL_RGBA[d], 
+                      marker=markers[d], 
+                      s=20,
+                      rasterized=True,
+                      zorder=1,
+                      label=f'd = {d} (all valid)')
     
     # Highlight current ranges
-    for d in current_d_range:
+    for d in _CURRENT_D_RANGE:
         if d in combinations:
             # Find combinations within current ranges
-            highlighted = []
-            for n, k in combinations[d]:
-                if (min(current_n_range) <= n <= max(current_n_range) and 
-                    min(current_k_range) <= k <= max(current_k_range)):
-                    highlighted.append((n, k))
+            arr = combinations[d]
+            mask = _in_current_range(arr)
+            highlighted = arr[mask]
             
-            if highlighted:
-                h_n_vals = [pair[0] for pair in highlighted]
-                h_k_vals = [pair[1] for pair in highlighted]
+            if len(highlighted):
+                h_n_vals = highlighted[:, 0].astype(np.float32)
+                h_k_vals = highlighted[:, 1].astype(np.float32)
                 
-                plt.scatter(h_n_vals, h_k_vals, 
-                           c=highlight_colors[d], 
-                           marker=markers[d], 
-                           alpha=0.9, 
-                           s=100,
-                           edgecolors='black',
-                           linewidth=2,
-                           label=f'd = {d} (current range: {len(highlighted)} combinations)')
+                ax.scatter(h_n_vals, h_k_vals, 
+                          color=_HIGHLIGHT_RGBA[d], 
+                          marker=markers[d], 
+                          s=100,
+                          rasterized=True,
+                          zorder=1,
+                          edgecolors=_HIGHLIGHT_EDGE_RGBA,
+                          linewidth=2,
+                          label=f'd = {d} (current range: {len(highlighted)} combinations)')
     
     # Add rectangle to show current parameter space
-    from matplotlib.patches import Rectangle
-    rect = Rectangle((min(current_n_range) - 0.4, min(current_k_range) - 0.4), 
-                    max(current_n_range) - min(current_n_range) + 0.8,
-                    max(current_k_range) - min(current_k_range) + 0.8,
+    rect = Rectangle(_RECT_XY, _RECT_WIDTH, _RECT_HEIGHT,
                     linewidth=3, edgecolor='black', facecolor='none', linestyle='--',
                     label='Current parameter space')
-    plt.gca().add_patch(rect)
+    ax.add_patch(rect)
     
     # Add boundary lines
-    n_range = np.linspace(1, 25, 100)
-    plt.plot(n_range, n_range - 2, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
-    plt.plot(n_range, n_range - 3, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
-    
-    plt.xlabel('n (codeword length)', fontsize=12)
-    plt.ylabel('k (message length)', fontsize=12)
-    plt.title('Valid (n,k) Combinations with Current Parameter Ranges Highlighted\n' + 
-              f'Current ranges: n ∈ [{min(current_n_range)}, {max(current_n_range)}], ' +
-              f'k ∈ [{min(current_k_range)}, {max(current_k_range)}], ' +
-              f'd ∈ [{min(current_d_range)}, {max(current_d_range)}]', fontsize=14)
-    plt.legend(fontsize=10, loc='upper left')
-    plt.grid(True, alpha=0.3)
-    plt.xlim(0, 26)
-    plt.ylim(0, 21)
-    
-    plt.tight_layout()
-    return plt
+    ax.plot(BOUND_N, BOUND_K3, 'b--', alpha=0.7, linewidth=1, label='d=3 boundary: k = n - 2')
+    ax.plot(BOUND_N, BOUND_K4, 'r--', alpha=0.7, linewidth=1, label='d=4 boundary: k = n - 3')
+    
+    ax.set_xlabel('n (codeword length)', fontsize=12)
+    ax.set_ylabel('k (message length)', fontsize=12)
+    ax.set_title('Valid (n,k) Combinations with Current Parameter Ranges Highlighted\n' + 
+                 f'Current ranges: n ∈ [{_LO_N}, {_HI_N}], ' +
+                 f'k ∈ [{_LO_K}, {_HI_K}], ' +
+                 f'd ∈ [{min(_CURRENT_D_RANGE)}, {max(_CURRENT_D_RANGE)}]', fontsize=14)
+    ax.legend(fontsize=10, loc='upper left')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlim(0, 26)
+    ax.set_ylim(0, 21)
+    
+    fig.tight_layout()
+    return fig
 
 def main():
     # Parse the data from ans.md
@@ -133,44 +114,50 @@ def main():
         return
     
     # Print summary of current parameter ranges
-    current_n_range = [16, 17]
-    current_k_range = [6, 7]
-    current_d_range = [3, 4]
-    
     print(f"\nCurrent parameter ranges from your code:")
-    print(f"n ∈ [{min(current_n_range)}, {max(current_n_range)}]")
-    print(f"k ∈ [{min(current_k_range)}, {max(current_k_range)}]")
-    print(f"d ∈ [{min(current_d_range)}, {max(current_d_range)}]")
+    print(f"n ∈ [{_LO_N}, {_HI_N}]")
+    print(f"k ∈ [{_LO_K}, {_HI_K}]")
+    print(f"d ∈ [{min(_CURRENT_D_RANGE)}, {max(_CURRENT_D_RANGE)}]")
     
     print(f"\nValid combinations in your current ranges:")
     total_current = 0
-    for d in current_d_range:
+    for d in _CURRENT_D_RANGE:
         if d in combinations:
-            count = 0
-            valid_combinations = []
-            for n, k in combinations[d]:
-                if (min(current_n_range) <= n <= max(current_n_range) and 
-                    min(current_k_range) <= k <= max(current_k_range)):
-                    count += 1
-                    total_current += 1
-                    valid_combinations.append((n, k))
+            arr = combinations[d]
+            mask = _in_current_range(arr)
+            valid_combinations = arr[mask]
+            count = len(valid_combinations)
+            total_current += count
             print(f"d = {d}: {count} combinations")
             for n, k in valid_combinations:
                 print(f"  (n={n}, k={k})")
     
     print(f"\nTotal valid combinations in your current ranges: {total_current}")
     
-    # Create highlighted plot
-    print("\nCreating highlighted plot...")
-    plt_highlight = plot_with_highlights(combinations)
-    plt_highlight.savefig('nk_combinations_highlighted.png', dpi=300, bbox_inches='tight')
-    print("Saved: nk_combinations_highlighted.png")
-    
-    # Show plot
-    plt.show()
+    # Skip saving if the plot was already rendered from the same data and plotting code
+    digest = combinations_digest(combinations, Path(__file__).read_bytes(),
+                                 Path(__file__).with_name('_plotting.py').read_bytes())
+    stale = not is_up_to_date('nk_combinations_highlighted.png', digest)
+    show = backend_is_interactive()
+    if not stale:
+        print("\nUp to date: nk_combinations_highlighted.png")
+    
+    if stale or show:
+        # Create highlighted plot
+        print("\nCreating highlighted plot...")
+        fig = plot_with_highlights(combinations)
+        if stale:
+            fig.savefig('nk_combinations_highlighted.png', dpi=300, bbox_inches='tight', pil_kwargs=PNG_KWARGS)
+            record_digest('nk_combinations_highlighted.png', digest)
+            print("Saved: nk_combinations_highlighted.png")
+        
+        # Show plot when the backend can open windows
+        if show:
+            plt.show()
     
-    print("\nHighlighted plot created!")
-    print("This shows your current parameter ranges in dark colors with black borders.")
+    if stale:
+        print("\nHighlighted plot created!")
+        print("This shows your current parameter ranges in dark colors with black borders.")
 
 if __name__ == "__main__":
     main()